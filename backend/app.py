@@ -3,39 +3,121 @@ VHC Shipment Management System - Backend API
 Flask-based REST API for managing consolidated shipments
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, redirect
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_caching import Cache
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import make_url
+from psycopg2.extras import execute_values
+import boto3
+from botocore.exceptions import ClientError
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHash
+from gevent import get_hub
+from gevent.monkey import is_module_patched
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, current_user
+from werkzeug.security import check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import os
-from functools import wraps
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import io
+import errno
+import fcntl
+import json
+import logging
+import math
+import mimetypes
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+
+from cache_serde import MsgpackSerializer
+from log_config import configure_logging
+from tasks import send_notification_email_task, update_last_login_task
+
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://localhost/vhc_shipments')
+# Pin the driver: a bare postgresql:// URL resolves to psycopg 3 when it is
+# installed, but bulk inserts use execute_values and wsgi.py greens psycopg2
+app.config['SQLALCHEMY_DATABASE_URI'] = make_url(
+    os.getenv('DATABASE_URL', 'postgresql://localhost/vhc_shipments')
+).set(drivername='postgresql+psycopg2')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,  # recycle before Postgres/proxy idle timeouts
+    'pool_timeout': 30,
+}
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', '/tmp/vhc_uploads')
 
+# Let the fronting web server stream downloads: X-Sendfile (Apache/lighttpd)
+# or, when a prefix is set, an nginx internal location mapped onto UPLOAD_FOLDER
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+app.config['X_ACCEL_REDIRECT_PREFIX'] = os.getenv('X_ACCEL_REDIRECT_PREFIX')
+
+app.config['CACHE_TYPE'] = 'RedisCache'
+app.config['CACHE_REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+app.config['CACHE_DEFAULT_TIMEOUT'] = 60
+
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'pdf', 'xlsx', 'xls', 'doc', 'docx', 'jpg', 'jpeg', 'png'}
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB copy buffer
+
+# Multipart uploads: clients send fixed-size parts in parallel, each written
+# at its own offset into a pre-allocated file under MULTIPART_FOLDER
+# S3 rejects any multipart part but the last below 5 MiB, so never go lower
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+MULTIPART_PART_SIZE = max(
+    int(os.getenv('MULTIPART_PART_SIZE', str(8 * 1024 * 1024))),
+    S3_MIN_PART_SIZE
+)
+MULTIPART_FOLDER = os.path.join(app.config['UPLOAD_FOLDER'], '.multipart')
+MULTIPART_UPLOAD_TTL = int(os.getenv('MULTIPART_UPLOAD_TTL', str(24 * 60 * 60)))
+MULTIPART_CLEANUP_INTERVAL = 10 * 60
+# Each staged upload reserves its full size on disk until it completes or expires
+MULTIPART_MAX_PER_USER = int(os.getenv('MULTIPART_MAX_PER_USER', '3'))
+
+# Direct-to-S3 documents: when a bucket is configured, clients upload and
+# download with presigned URLs and file bytes never pass through the API.
+# Clients that never call finalize leave multipart uploads open, and their
+# parts are billed until aborted, so the bucket needs a lifecycle rule with
+# AbortIncompleteMultipartUpload (DaysAfterInitiation: 1) on documents/
+S3_BUCKET = os.getenv('S3_BUCKET')
+S3_PRESIGN_EXPIRES = int(os.getenv('S3_PRESIGN_EXPIRES', '900'))
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
 db = SQLAlchemy(app)
 jwt = JWTManager(app)
+cache = Cache(app)
+cache.cache.serializer = MsgpackSerializer()
+
+# New hashes are argon2id; werkzeug PBKDF2/scrypt hashes are still accepted
+# and upgraded on the user's next successful login
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+password_pool = ThreadPoolExecutor(max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', '4')))
+
+s3 = boto3.client('s3', region_name=os.getenv('AWS_REGION')) if S3_BUCKET else None
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+os.makedirs(MULTIPART_FOLDER, exist_ok=True)
 
 
 # Helper Functions
@@ -43,48 +125,492 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def upload_fileno(stream):
+    """File descriptor behind an upload stream, if werkzeug has spooled it to disk"""
+    # SpooledTemporaryFile.fileno() would force an in-memory upload onto disk
+    if getattr(stream, '_rolled', True) is False:
+        return None
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def copy_in_kernel(src_fd, offset, dst_fd):
+    """Copy src_fd from offset into dst_fd with copy_file_range(2)
+
+    Returns the bytes copied, or None when the kernel/filesystem can't do it
+    and the caller should fall back to a userspace copy.
+    """
+    size = 0
+    try:
+        while True:
+            copied = os.copy_file_range(src_fd, dst_fd, app.config['MAX_CONTENT_LENGTH'], offset + size)
+            if not copied:
+                return size
+            size += copied
+    except OSError as e:
+        if size == 0 and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            return None
+        raise
+
+
+def save_upload(stream, file_path):
+    """Write an uploaded stream to disk and return the bytes written"""
+    src_fd = upload_fileno(stream) if hasattr(os, 'copy_file_range') else None
+    with open(file_path, 'wb') as dst:
+        size = None
+        if src_fd is not None:
+            # Already on disk: one syscall, no round-trip through Python buffers
+            size = copy_in_kernel(src_fd, stream.tell(), dst.fileno())
+        if size is None:
+            shutil.copyfileobj(stream, dst, UPLOAD_CHUNK_SIZE)
+            size = dst.tell()
+        if hasattr(os, 'posix_fadvise'):
+            # Uploads are not read back by the API, so don't let them crowd the page cache
+            dst.flush()
+            os.posix_fadvise(dst.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    return size
+
+
+def document_file_path(shipment_id, filename):
+    """Build a unique storage path for an uploaded document"""
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    unique_filename = f"{shipment_id}_{timestamp}_{filename}"
+    return os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+
+
+def multipart_dir(upload_id):
+    """Staging directory for a multipart upload, or None if the id is malformed"""
+    try:
+        upload_id = uuid.UUID(upload_id).hex
+    except ValueError:
+        return None
+    return os.path.join(MULTIPART_FOLDER, upload_id)
+
+
+_last_multipart_cleanup = 0
+
+
+def expire_multipart_uploads():
+    """Remove staging directories of multipart uploads abandoned past the TTL"""
+    global _last_multipart_cleanup
+    now = time.time()
+    if now - _last_multipart_cleanup < MULTIPART_CLEANUP_INTERVAL:
+        return
+    _last_multipart_cleanup = now
+
+    for entry in os.scandir(MULTIPART_FOLDER):
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        try:
+            # Each uploaded part adds a marker file, bumping the directory mtime
+            if now - entry.stat(follow_symlinks=False).st_mtime > MULTIPART_UPLOAD_TTL:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def count_multipart_uploads(email):
+    """Number of multipart uploads the given user currently has staged"""
+    count = 0
+    for entry in os.scandir(MULTIPART_FOLDER):
+        try:
+            with open(os.path.join(entry.path, 'upload.json')) as f:
+                if json.load(f)['uploaded_by'] == email:
+                    count += 1
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+    return count
+
+
+def load_multipart_upload(upload_id, email):
+    """Load multipart upload metadata owned by the given user"""
+    upload_dir = multipart_dir(upload_id)
+    if upload_dir is None:
+        return None, None
+    try:
+        with open(os.path.join(upload_dir, 'upload.json')) as f:
+            upload = json.load(f)
+    except FileNotFoundError:
+        return None, None
+    if upload['uploaded_by'] != email:
+        return None, None
+    return upload_dir, upload
+
+
+def run_password_work(fn, *args):
+    """Run CPU-bound password hashing on a native thread
+
+    argon2 and hashlib release the GIL while hashing, so other requests keep
+    being served. Under gevent the stdlib executor's threads are greenlets,
+    so use the hub's native threadpool instead.
+    """
+    if is_module_patched('threading'):
+        return get_hub().threadpool.apply(fn, args)
+    return password_pool.submit(fn, *args).result()
+
+
+def hash_password(password):
+    return run_password_work(password_hasher.hash, password)
+
+
+def verify_password(password_hash, password):
+    """Check a password against an argon2 hash or a legacy werkzeug hash"""
+    return run_password_work(_verify_password, password_hash, password)
+
+
+def _verify_password(password_hash, password):
+    if password_hash.startswith('$argon2'):
+        try:
+            return password_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHash):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+def password_needs_rehash(password_hash):
+    return (not password_hash.startswith('$argon2')
+            or password_hasher.check_needs_rehash(password_hash))
+
+
+INVOICE_REQUIRED_FIELDS = ['shipment_id', 'invoice_number', 'total_amount']
+
+
+def invoice_params(data, invoice_date):
+    """Bind parameters for inserting one invoice from a request payload"""
+    return {
+        'shipment_id': data['shipment_id'],
+        'invoice_number': data['invoice_number'],
+        'invoice_date': invoice_date,
+        'invoice_type': data.get('invoice_type', 'FINAL'),
+        'freight_charges': data.get('freight_charges', 0),
+        'customs_clearance': data.get('customs_clearance', 0),
+        'documentation_fee': data.get('documentation_fee', 0),
+        'handling_charges': data.get('handling_charges', 0),
+        'rail_charges': data.get('rail_charges', 0),
+        'other_charges': data.get('other_charges', 0),
+        'total_amount': data['total_amount'],
+        'currency': data.get('currency', 'USD')
+    }
+
+
+def s3_key_prefix(shipment_id, user_id):
+    """Key prefix a user's direct uploads for a shipment are issued under"""
+    return f"documents/{shipment_id}/{user_id}/"
+
+
+def s3_document_key(shipment_id, user_id, filename):
+    """Unique object key for a document stored in S3"""
+    return f"{s3_key_prefix(shipment_id, user_id)}{uuid.uuid4().hex}_{filename}"
+
+
+def parse_s3_path(file_path):
+    """Split an s3://bucket/key document path into (bucket, key)"""
+    bucket, _, key = file_path[len('s3://'):].partition('/')
+    return bucket, key
+
+
 def role_required(allowed_roles):
     """Decorator to check user roles"""
     def decorator(fn):
         @wraps(fn)
         @jwt_required()
         def wrapper(*args, **kwargs):
-            current_user = get_jwt_identity()
-            user_role = current_user.get('role')
-            if user_role not in allowed_roles:
+            if current_user['role'] not in allowed_roles:
                 return jsonify({'error': 'Unauthorized access'}), 403
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
 
-def send_notification_email(recipients, subject, message):
-    """Send email notifications"""
+def json_list_sql(key, row_sql):
+    """Wrap a row query so Postgres returns {key: [rows...]} as a single JSON text value"""
+    return f"""
+    SELECT json_build_object('{key}', COALESCE(json_agg(t), '[]'))::text
+    FROM ({row_sql}) t
+"""
+
+
+def json_text_response(result, status=200):
+    """Return a JSON document built by Postgres without re-serializing it"""
+    return app.response_class(result[0], status=status, mimetype='application/json')
+
+
+DASHBOARD_STATS_CACHE_KEY = 'dash_stats'
+
+
+def invalidate_dashboard_stats():
+    """Drop cached dashboard stats after a write that changes them"""
+    cache.delete(DASHBOARD_STATS_CACHE_KEY)
+
+
+USER_CACHE_TIMEOUT = 300  # seconds
+
+
+def load_login_user(email):
+    """Fetch the login record for an email, served from Redis for a few minutes"""
+    cache_key = f'login:{email}'
+    user = cache.get(cache_key)
+    if user is None:
+        result = db.session.execute(LOGIN_Q, {'email': email}).fetchone()
+        if not result:
+            return None
+        user = dict(result._mapping)
+        cache.set(cache_key, user, timeout=USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user_cache(user_id, email):
+    """Drop cached user records after the user row changes"""
+    cache.delete_many(f'user:{user_id}', f'login:{email}')
+
+
+@jwt.user_lookup_loader
+def load_current_user(jwt_header, jwt_data):
+    """Hydrate current_user from the token's user id, served from Redis for a few minutes"""
+    try:
+        user_id = int(jwt_data['sub'])
+    except (TypeError, ValueError):
+        # Tokens issued before identities were plain user ids
+        return None
+
+    cache_key = f'user:{user_id}'
+    user = cache.get(cache_key)
+    if user is None:
+        result = db.session.execute(CURRENT_USER_Q, {'user_id': user_id}).fetchone()
+        if not result:
+            return None
+        user = dict(result._mapping)
+        cache.set(cache_key, user, timeout=USER_CACHE_TIMEOUT)
+
+    # Deactivated users are refused even while their token is still valid
+    return user if user['is_active'] else None
+
+
+def enqueue_notification_email(recipients, subject, body):
+    """Queue a notification email; a broker outage must not fail a request that already committed"""
     try:
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('SMTP_PORT', '587'))
-        smtp_user = os.getenv('SMTP_USER')
-        smtp_password = os.getenv('SMTP_PASSWORD')
+        send_notification_email_task.delay(recipients, subject, body)
+    except Exception:
+        logger.exception("Failed to queue notification email %r", subject)
 
-        if not smtp_user or not smtp_password:
-            print("Email credentials not configured")
-            return False
 
-        msg = MIMEMultipart()
-        msg['From'] = smtp_user
-        msg['To'] = ', '.join(recipients) if isinstance(recipients, list) else recipients
-        msg['Subject'] = subject
-        msg.attach(MIMEText(message, 'html'))
+# ==================== SQL STATEMENTS ====================
+
+LOGIN_Q = text("""
+    SELECT user_id, email, password_hash, full_name, role, team, is_active
+    FROM users WHERE email = :email
+""")
+
+CURRENT_USER_Q = text("""
+    SELECT user_id, email, full_name, role, team, is_active
+    FROM users WHERE user_id = :user_id
+""")
+
+UPDATE_PASSWORD_HASH_Q = text("UPDATE users SET password_hash = :password_hash WHERE user_id = :user_id")
+
+USER_EXISTS_Q = text("SELECT user_id FROM users WHERE email = :email")
+
+INSERT_USER_Q = text("""
+    INSERT INTO users (email, password_hash, full_name, role, team, username)
+    VALUES (:email, :password_hash, :full_name, :role, :team, :username)
+    RETURNING user_id
+""")
+
+# List and detail responses are built as JSON inside Postgres (timestamps come
+# out as ISO 8601) and cast to text so the driver hands them back undecoded
+SHIPMENT_LIST_SQL = json_list_sql('shipments', """
+        SELECT
+            shipment_id, booking_number, container_number, vessel_name,
+            steamship_line, rail_provider, master_bl, house_bl,
+            current_status, current_milestone, origin_port, destination_port,
+            booking_date, vessel_departure_date, pod_date, poe_date,
+            customs_release_date, pickup_date
+        FROM shipments
+        {where_clause}
+        ORDER BY created_at DESC
+        LIMIT 100
+""")
+
+
+@lru_cache(maxsize=16)
+def build_shipments_query(has_booking, has_status, has_container):
+    """Statement for one of the 8 filter combinations, built once and reused"""
+    filters = []
+    if has_booking:
+        filters.append("booking_number ILIKE :booking_number")
+    if has_status:
+        filters.append("current_status = :status")
+    if has_container:
+        filters.append("container_number ILIKE :container_number")
+
+    where_clause = "WHERE " + " AND ".join(filters) if filters else ""
+    return text(SHIPMENT_LIST_SQL.format(where_clause=where_clause))
+
+
+SHIPMENT_DETAIL_Q = text("""
+    SELECT (to_jsonb(s) || jsonb_build_object(
+        'purchase_orders', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'po_id', po.po_id,
+                'po_number', po.po_number,
+                'vendor_reference', po.vendor_reference,
+                'shipper_name', sh.shipper_name
+            ) ORDER BY po.po_id)
+            FROM purchase_orders po
+            LEFT JOIN shippers sh ON po.shipper_id = sh.shipper_id
+            WHERE po.shipment_id = s.shipment_id
+        ), '[]'),
+        'milestones', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'milestone_id', m.milestone_id,
+                'milestone_name', m.milestone_name,
+                'status', m.milestone_status,
+                'actual_date', m.actual_date
+            ) ORDER BY m.actual_date, m.milestone_id)
+            FROM milestones m
+            WHERE m.shipment_id = s.shipment_id
+        ), '[]')
+    ))::text
+    FROM shipments s
+    WHERE s.shipment_id = :shipment_id
+""")
+
+# Shipment and its initial milestone in one statement
+CREATE_SHIPMENT_Q = text("""
+    WITH new_shipment AS (
+        INSERT INTO shipments (
+            booking_number, origin_port, destination_port, booking_date,
+            current_status, current_milestone
+        ) VALUES (
+            :booking_number, :origin_port, :destination_port, :booking_date,
+            :current_status, :current_milestone
+        )
+        RETURNING shipment_id
+    )
+    INSERT INTO milestones (shipment_id, milestone_name, milestone_status, actual_date, created_by)
+    SELECT shipment_id, :current_milestone, 'COMPLETED', :booking_date, :created_by
+    FROM new_shipment
+    RETURNING shipment_id
+""")
+
+# Milestone insert, shipment update and the booking number for the
+# notification in one round-trip
+UPDATE_MILESTONE_Q = text("""
+    WITH new_milestone AS (
+        INSERT INTO milestones (
+            shipment_id, milestone_name, milestone_status, actual_date,
+            location, notes, created_by
+        ) VALUES (
+            :shipment_id, :milestone_name, :milestone_status, :actual_date,
+            :location, :notes, :created_by
+        )
+        RETURNING milestone_id
+    ), updated_shipment AS (
+        UPDATE shipments SET current_milestone = :milestone_name, updated_at = :actual_date
+        WHERE shipment_id = :shipment_id
+        RETURNING booking_number
+    )
+    SELECT new_milestone.milestone_id, updated_shipment.booking_number
+    FROM new_milestone, updated_shipment
+""")
 
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+DOCUMENT_LIST_Q = text(json_list_sql('documents', """
+        SELECT
+            document_id, document_type, document_name, file_size,
+            uploaded_by, upload_source, created_at
+        FROM documents
+        WHERE shipment_id = :shipment_id
+        ORDER BY created_at DESC
+"""))
+
+INSERT_DOCUMENT_Q = text("""
+    INSERT INTO documents (
+        shipment_id, document_type, document_name, file_path,
+        file_size, mime_type, uploaded_by, upload_source
+    ) VALUES (
+        :shipment_id, :document_type, :document_name, :file_path,
+        :file_size, :mime_type, :uploaded_by, :upload_source
+    )
+    RETURNING document_id
+""")
+
+DOCUMENT_FILE_Q = text("SELECT file_path, document_name FROM documents WHERE document_id = :document_id")
+
+DOCUMENT_BY_PATH_Q = text("SELECT document_id FROM documents WHERE file_path = :file_path")
+
+INVOICE_LIST_Q = text(json_list_sql('invoices', """
+        SELECT
+            invoice_id, invoice_number, invoice_date, invoice_type,
+            COALESCE(total_amount, 0) AS total_amount, currency, payment_status
+        FROM invoices
+        WHERE shipment_id = :shipment_id
+        ORDER BY invoice_date DESC
+"""))
+
+INSERT_INVOICE_Q = text("""
+    INSERT INTO invoices (
+        shipment_id, invoice_number, invoice_date, invoice_type,
+        freight_charges, customs_clearance, documentation_fee,
+        handling_charges, rail_charges, other_charges, total_amount, currency
+    ) VALUES (
+        :shipment_id, :invoice_number, :invoice_date, :invoice_type,
+        :freight_charges, :customs_clearance, :documentation_fee,
+        :handling_charges, :rail_charges, :other_charges, :total_amount, :currency
+    )
+    RETURNING invoice_id
+""")
+
+# Multi-row form of INSERT_INVOICE_Q for psycopg2's execute_values, which
+# expands VALUES %s into one statement per page of rows
+INSERT_INVOICES_BULK_SQL = """
+    INSERT INTO invoices (
+        shipment_id, invoice_number, invoice_date, invoice_type,
+        freight_charges, customs_clearance, documentation_fee,
+        handling_charges, rail_charges, other_charges, total_amount, currency
+    ) VALUES %s
+    RETURNING invoice_id
+"""
 
-        return True
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        return False
+INVOICE_VALUES_TEMPLATE = """(
+    %(shipment_id)s, %(invoice_number)s, %(invoice_date)s, %(invoice_type)s,
+    %(freight_charges)s, %(customs_clearance)s, %(documentation_fee)s,
+    %(handling_charges)s, %(rail_charges)s, %(other_charges)s, %(total_amount)s, %(currency)s
+)"""
+
+# One round-trip for all four dashboard aggregates
+DASHBOARD_STATS_Q = text("""
+    WITH active AS (
+        SELECT COUNT(*) AS c FROM shipments WHERE current_status != 'COMPLETED'
+    ), by_status AS (
+        SELECT COALESCE(json_object_agg(current_status, c), '{}') AS j
+        FROM (
+            SELECT current_status, COUNT(*) AS c FROM shipments
+            WHERE current_status IS NOT NULL
+            GROUP BY current_status
+        ) s
+    ), pending AS (
+        SELECT COUNT(*) AS c FROM exceptions WHERE status != 'RESOLVED'
+    ), recent AS (
+        SELECT COUNT(*) AS c FROM milestones
+        WHERE actual_date > NOW() - INTERVAL '7 days'
+    )
+    SELECT active.c, by_status.j, pending.c, recent.c
+    FROM active, by_status, pending, recent
+""")
+
+INSERT_EXCEPTION_Q = text("""
+    INSERT INTO exceptions (
+        shipment_id, exception_type, severity, title, description,
+        reported_by, status
+    ) VALUES (
+        :shipment_id, :exception_type, :severity, :title, :description,
+        :reported_by, :status
+    )
+    RETURNING exception_id,
+        (SELECT booking_number FROM shipments WHERE shipment_id = :shipment_id)
+""")
 
 
 # ==================== AUTHENTICATION ROUTES ====================
@@ -99,45 +625,41 @@ def login():
     if not email or not password:
         return jsonify({'error': 'Email and password required'}), 400
 
-    # Query user from database
-    query = """
-        SELECT user_id, email, password_hash, full_name, role, team, is_active
-        FROM users WHERE email = %s
-    """
-    result = db.session.execute(query, (email,)).fetchone()
+    user = load_login_user(email)
 
-    if not result or not check_password_hash(result[2], password):
+    if not user or not verify_password(user['password_hash'], password):
         return jsonify({'error': 'Invalid credentials'}), 401
 
-    if not result[6]:  # is_active
+    if not user['is_active']:
         return jsonify({'error': 'Account is inactive'}), 403
 
-    # Update last login
-    db.session.execute(
-        "UPDATE users SET last_login = %s WHERE user_id = %s",
-        (datetime.utcnow(), result[0])
-    )
-    db.session.commit()
+    # Migrate legacy hashes to argon2 while we have the plaintext
+    if password_needs_rehash(user['password_hash']):
+        db.session.execute(
+            UPDATE_PASSWORD_HASH_Q,
+            {'password_hash': hash_password(password), 'user_id': user['user_id']}
+        )
+        db.session.commit()
+        invalidate_user_cache(user['user_id'], email)
 
-    # Create JWT token
-    access_token = create_access_token(
-        identity={
-            'user_id': result[0],
-            'email': result[1],
-            'full_name': result[3],
-            'role': result[4],
-            'team': result[5]
-        }
-    )
+    # Update last login without holding up the response; a lost update
+    # must not block the login itself
+    try:
+        update_last_login_task.delay(user['user_id'], datetime.utcnow().isoformat())
+    except Exception:
+        logger.exception("Failed to queue last login update for user %s", user['user_id'])
+
+    # Create JWT token; role and team are looked up per request, not embedded
+    access_token = create_access_token(identity=str(user['user_id']))
 
     return jsonify({
         'access_token': access_token,
         'user': {
-            'user_id': result[0],
-            'email': result[1],
-            'full_name': result[3],
-            'role': result[4],
-            'team': result[5]
+            'user_id': user['user_id'],
+            'email': user['email'],
+            'full_name': user['full_name'],
+            'role': user['role'],
+            'team': user['team']
         }
     }), 200
 
@@ -153,29 +675,28 @@ def register_user():
         return jsonify({'error': 'Missing required fields'}), 400
 
     # Check if user exists
-    existing = db.session.execute(
-        "SELECT user_id FROM users WHERE email = %s",
-        (data['email'],)
-    ).fetchone()
+    existing = db.session.execute(USER_EXISTS_Q, {'email': data['email']}).fetchone()
 
     if existing:
         return jsonify({'error': 'User already exists'}), 409
 
     # Hash password and insert user
-    password_hash = generate_password_hash(data['password'])
+    password_hash = hash_password(data['password'])
 
-    query = """
-        INSERT INTO users (email, password_hash, full_name, role, team, username)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        RETURNING user_id
-    """
     result = db.session.execute(
-        query,
-        (data['email'], password_hash, data['full_name'], data['role'],
-         data.get('team'), data['email'].split('@')[0])
+        INSERT_USER_Q,
+        {
+            'email': data['email'],
+            'password_hash': password_hash,
+            'full_name': data['full_name'],
+            'role': data['role'],
+            'team': data.get('team'),
+            'username': data['email'].split('@')[0]
+        }
     )
     user_id = result.fetchone()[0]
     db.session.commit()
+    invalidate_user_cache(user_id, data['email'])
 
     return jsonify({'message': 'User created successfully', 'user_id': user_id}), 201
 
@@ -186,110 +707,34 @@ def register_user():
 @jwt_required()
 def get_shipments():
     """Get all shipments with filters"""
-    current_user = get_jwt_identity()
-
-    # Build query based on filters
-    filters = []
-    params = []
+    booking_number = request.args.get('booking_number')
+    status = request.args.get('status')
+    container_number = request.args.get('container_number')
 
-    if request.args.get('booking_number'):
-        filters.append("booking_number ILIKE %s")
-        params.append(f"%{request.args.get('booking_number')}%")
-
-    if request.args.get('status'):
-        filters.append("current_status = %s")
-        params.append(request.args.get('status'))
-
-    if request.args.get('container_number'):
-        filters.append("container_number ILIKE %s")
-        params.append(f"%{request.args.get('container_number')}%")
-
-    where_clause = "WHERE " + " AND ".join(filters) if filters else ""
+    params = {}
+    if booking_number:
+        params['booking_number'] = f"%{booking_number}%"
+    if status:
+        params['status'] = status
+    if container_number:
+        params['container_number'] = f"%{container_number}%"
 
-    query = f"""
-        SELECT
-            shipment_id, booking_number, container_number, vessel_name,
-            steamship_line, rail_provider, master_bl, house_bl,
-            current_status, current_milestone, origin_port, destination_port,
-            booking_date, vessel_departure_date, pod_date, poe_date,
-            customs_release_date, pickup_date
-        FROM shipments
-        {where_clause}
-        ORDER BY created_at DESC
-        LIMIT 100
-    """
+    query = build_shipments_query(bool(booking_number), bool(status), bool(container_number))
+    result = db.session.execute(query, params).fetchone()
 
-    results = db.session.execute(query, params).fetchall()
-
-    shipments = []
-    for row in results:
-        shipments.append({
-            'shipment_id': row[0],
-            'booking_number': row[1],
-            'container_number': row[2],
-            'vessel_name': row[3],
-            'steamship_line': row[4],
-            'rail_provider': row[5],
-            'master_bl': row[6],
-            'house_bl': row[7],
-            'current_status': row[8],
-            'current_milestone': row[9],
-            'origin_port': row[10],
-            'destination_port': row[11],
-            'booking_date': row[12].isoformat() if row[12] else None,
-            'vessel_departure_date': row[13].isoformat() if row[13] else None,
-            'pod_date': row[14].isoformat() if row[14] else None,
-            'poe_date': row[15].isoformat() if row[15] else None,
-            'customs_release_date': row[16].isoformat() if row[16] else None,
-            'pickup_date': row[17].isoformat() if row[17] else None
-        })
-
-    return jsonify({'shipments': shipments}), 200
+    return json_text_response(result)
 
 
 @app.route('/api/shipments/<int:shipment_id>', methods=['GET'])
 @jwt_required()
 def get_shipment_detail(shipment_id):
     """Get detailed shipment information"""
-    query = """
-        SELECT
-            s.*,
-            COALESCE(json_agg(DISTINCT jsonb_build_object(
-                'po_id', po.po_id,
-                'po_number', po.po_number,
-                'vendor_reference', po.vendor_reference,
-                'shipper_name', sh.shipper_name
-            )) FILTER (WHERE po.po_id IS NOT NULL), '[]') as purchase_orders,
-            COALESCE(json_agg(DISTINCT jsonb_build_object(
-                'milestone_id', m.milestone_id,
-                'milestone_name', m.milestone_name,
-                'status', m.milestone_status,
-                'actual_date', m.actual_date
-            )) FILTER (WHERE m.milestone_id IS NOT NULL), '[]') as milestones
-        FROM shipments s
-        LEFT JOIN purchase_orders po ON s.shipment_id = po.shipment_id
-        LEFT JOIN shippers sh ON po.shipper_id = sh.shipper_id
-        LEFT JOIN milestones m ON s.shipment_id = m.shipment_id
-        WHERE s.shipment_id = %s
-        GROUP BY s.shipment_id
-    """
-
-    result = db.session.execute(query, (shipment_id,)).fetchone()
+    result = db.session.execute(SHIPMENT_DETAIL_Q, {'shipment_id': shipment_id}).fetchone()
 
     if not result:
         return jsonify({'error': 'Shipment not found'}), 404
 
-    # Convert to dict (simplified for brevity)
-    shipment = {
-        'shipment_id': result[0],
-        'booking_number': result[1],
-        'container_number': result[2],
-        # ... add all other fields
-        'purchase_orders': result[-2],
-        'milestones': result[-1]
-    }
-
-    return jsonify(shipment), 200
+    return json_text_response(result)
 
 
 @app.route('/api/shipments', methods=['POST'])
@@ -297,38 +742,30 @@ def get_shipment_detail(shipment_id):
 def create_shipment():
     """Create new shipment (Seair Origin team)"""
     data = request.get_json()
-    current_user = get_jwt_identity()
 
     required_fields = ['booking_number']
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
 
-    query = """
-        INSERT INTO shipments (
-            booking_number, origin_port, destination_port, booking_date,
-            current_status, current_milestone
-        ) VALUES (%s, %s, %s, %s, %s, %s)
-        RETURNING shipment_id
-    """
-
     result = db.session.execute(
-        query,
-        (data['booking_number'], data.get('origin_port'), data.get('destination_port'),
-         datetime.utcnow(), 'BOOKING_CREATED', 'BOOKING_CONFIRMED')
+        CREATE_SHIPMENT_Q,
+        {
+            'booking_number': data['booking_number'],
+            'origin_port': data.get('origin_port'),
+            'destination_port': data.get('destination_port'),
+            'booking_date': datetime.utcnow(),
+            'current_status': 'BOOKING_CREATED',
+            'current_milestone': 'BOOKING_CONFIRMED',
+            'created_by': current_user['email']
+        }
     )
     shipment_id = result.fetchone()[0]
 
-    # Create initial milestone
-    db.session.execute(
-        """INSERT INTO milestones (shipment_id, milestone_name, milestone_status, actual_date, created_by)
-           VALUES (%s, %s, %s, %s, %s)""",
-        (shipment_id, 'BOOKING_CONFIRMED', 'COMPLETED', datetime.utcnow(), current_user['email'])
-    )
-
     db.session.commit()
+    invalidate_dashboard_stats()
 
     # Send notification
-    send_notification_email(
+    enqueue_notification_email(
         ['vhc-team@example.com'],
         f'New Booking Created: {data["booking_number"]}',
         f'A new shipment booking has been created with booking number {data["booking_number"]}'
@@ -342,46 +779,33 @@ def create_shipment():
 def update_milestone(shipment_id):
     """Update shipment milestone"""
     data = request.get_json()
-    current_user = get_jwt_identity()
 
     milestone_name = data.get('milestone_name')
     if not milestone_name:
         return jsonify({'error': 'milestone_name required'}), 400
 
-    # Insert milestone
-    query = """
-        INSERT INTO milestones (
-            shipment_id, milestone_name, milestone_status, actual_date,
-            location, notes, created_by
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-        RETURNING milestone_id
-    """
-
     result = db.session.execute(
-        query,
-        (shipment_id, milestone_name, 'COMPLETED', datetime.utcnow(),
-         data.get('location'), data.get('notes'), current_user['email'])
-    )
-    milestone_id = result.fetchone()[0]
-
-    # Update shipment current milestone
-    db.session.execute(
-        "UPDATE shipments SET current_milestone = %s, updated_at = %s WHERE shipment_id = %s",
-        (milestone_name, datetime.utcnow(), shipment_id)
+        UPDATE_MILESTONE_Q,
+        {
+            'shipment_id': shipment_id,
+            'milestone_name': milestone_name,
+            'milestone_status': 'COMPLETED',
+            'actual_date': datetime.utcnow(),
+            'location': data.get('location'),
+            'notes': data.get('notes'),
+            'created_by': current_user['email']
+        }
     )
+    milestone_id, booking_number = result.fetchone()
 
     db.session.commit()
+    invalidate_dashboard_stats()
 
     # Send notification
-    shipment = db.session.execute(
-        "SELECT booking_number FROM shipments WHERE shipment_id = %s",
-        (shipment_id,)
-    ).fetchone()
-
-    send_notification_email(
+    enqueue_notification_email(
         ['vhc-team@example.com'],
         f'Milestone Update: {milestone_name}',
-        f'Shipment {shipment[0]} has reached milestone: {milestone_name}'
+        f'Shipment {booking_number} has reached milestone: {milestone_name}'
     )
 
     return jsonify({'message': 'Milestone updated', 'milestone_id': milestone_id}), 200
@@ -393,38 +817,15 @@ def update_milestone(shipment_id):
 @jwt_required()
 def get_shipment_documents(shipment_id):
     """Get all documents for a shipment"""
-    query = """
-        SELECT
-            document_id, document_type, document_name, file_size,
-            uploaded_by, upload_source, created_at
-        FROM documents
-        WHERE shipment_id = %s
-        ORDER BY created_at DESC
-    """
-
-    results = db.session.execute(query, (shipment_id,)).fetchall()
-
-    documents = []
-    for row in results:
-        documents.append({
-            'document_id': row[0],
-            'document_type': row[1],
-            'document_name': row[2],
-            'file_size': row[3],
-            'uploaded_by': row[4],
-            'upload_source': row[5],
-            'created_at': row[6].isoformat() if row[6] else None
-        })
+    result = db.session.execute(DOCUMENT_LIST_Q, {'shipment_id': shipment_id}).fetchone()
 
-    return jsonify({'documents': documents}), 200
+    return json_text_response(result)
 
 
 @app.route('/api/shipments/<int:shipment_id>/documents/upload', methods=['POST'])
 @jwt_required()
 def upload_document(shipment_id):
     """Upload document for shipment"""
-    current_user = get_jwt_identity()
-
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
 
@@ -439,26 +840,23 @@ def upload_document(shipment_id):
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        unique_filename = f"{shipment_id}_{timestamp}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        file_path = document_file_path(shipment_id, filename)
 
-        file.save(file_path)
+        file_size = save_upload(file.stream, file_path)
 
         # Save to database
-        query = """
-            INSERT INTO documents (
-                shipment_id, document_type, document_name, file_path,
-                file_size, mime_type, uploaded_by, upload_source
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING document_id
-        """
-
         result = db.session.execute(
-            query,
-            (shipment_id, document_type, filename, file_path,
-             os.path.getsize(file_path), file.content_type,
-             current_user['email'], current_user['team'])
+            INSERT_DOCUMENT_Q,
+            {
+                'shipment_id': shipment_id,
+                'document_type': document_type,
+                'document_name': filename,
+                'file_path': file_path,
+                'file_size': file_size,
+                'mime_type': file.content_type,
+                'uploaded_by': current_user['email'],
+                'upload_source': current_user['team']
+            }
         )
         document_id = result.fetchone()[0]
         db.session.commit()
@@ -471,21 +869,387 @@ def upload_document(shipment_id):
     return jsonify({'error': 'Invalid file type'}), 400
 
 
+@app.route('/api/shipments/<int:shipment_id>/documents/multipart/init', methods=['POST'])
+@jwt_required()
+def init_multipart_upload(shipment_id):
+    """Start a multipart document upload"""
+    data = request.get_json()
+
+    filename = data.get('filename')
+    document_type = data.get('document_type')
+    total_size = data.get('total_size')
+
+    if not filename or not document_type or not isinstance(total_size, int):
+        return jsonify({'error': 'filename, document_type and total_size required'}), 400
+
+    if not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    if total_size <= 0 or total_size > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'Invalid file size'}), 400
+
+    expire_multipart_uploads()
+    if count_multipart_uploads(current_user['email']) >= MULTIPART_MAX_PER_USER:
+        return jsonify({'error': 'Too many uploads in progress'}), 429
+
+    upload_id = uuid.uuid4().hex
+    upload_dir = multipart_dir(upload_id)
+    os.makedirs(upload_dir)
+
+    # Reserve the full file up front so parts can be written at any offset
+    fd = os.open(os.path.join(upload_dir, 'data'), os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, total_size)
+        else:
+            os.ftruncate(fd, total_size)
+    finally:
+        os.close(fd)
+
+    filename = secure_filename(filename)
+    part_count = math.ceil(total_size / MULTIPART_PART_SIZE)
+    upload = {
+        'shipment_id': shipment_id,
+        'document_type': document_type,
+        'filename': filename,
+        'mime_type': mimetypes.guess_type(filename)[0],
+        'total_size': total_size,
+        'part_size': MULTIPART_PART_SIZE,
+        'part_count': part_count,
+        'uploaded_by': current_user['email'],
+        'upload_source': current_user['team']
+    }
+    with open(os.path.join(upload_dir, 'upload.json'), 'w') as f:
+        json.dump(upload, f)
+
+    return jsonify({
+        'upload_id': upload_id,
+        'part_size': MULTIPART_PART_SIZE,
+        'part_count': part_count
+    }), 201
+
+
+@app.route('/api/documents/multipart/<upload_id>/<int:part_no>', methods=['PUT'])
+@jwt_required()
+def upload_multipart_part(upload_id, part_no):
+    """Upload one part of a multipart document upload (parts may arrive in any order)"""
+    upload_dir, upload = load_multipart_upload(upload_id, current_user['email'])
+
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    if part_no < 1 or part_no > upload['part_count']:
+        return jsonify({'error': 'Invalid part number'}), 400
+
+    offset = (part_no - 1) * upload['part_size']
+    expected_size = min(upload['part_size'], upload['total_size'] - offset)
+    part_marker = os.path.join(upload_dir, f'part_{part_no}')
+
+    try:
+        fd = os.open(os.path.join(upload_dir, 'data'), os.O_WRONLY)
+    except FileNotFoundError:
+        return jsonify({'error': 'Upload is being completed'}), 409
+
+    written = 0
+    try:
+        # Parts share the lock; complete takes it exclusively, so a part is
+        # never written while the file is being registered
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return jsonify({'error': 'Upload is being completed'}), 409
+        if os.path.exists(os.path.join(upload_dir, 'completing')):
+            return jsonify({'error': 'Upload is being completed'}), 409
+
+        # The new bytes overwrite any earlier copy of this part, so it only
+        # counts as uploaded again once the new copy is complete
+        try:
+            os.unlink(part_marker)
+        except FileNotFoundError:
+            pass
+
+        while written < expected_size:
+            chunk = request.stream.read(min(UPLOAD_CHUNK_SIZE, expected_size - written))
+            if not chunk:
+                break
+            os.pwrite(fd, chunk, offset + written)
+            written += len(chunk)
+
+        if written != expected_size or request.stream.read(1):
+            return jsonify({'error': f'Part {part_no} must be exactly {expected_size} bytes'}), 400
+
+        open(part_marker, 'w').close()
+    finally:
+        os.close(fd)
+
+    return jsonify({'part_no': part_no, 'size': written}), 200
+
+
+@app.route('/api/documents/multipart/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_multipart_upload(upload_id):
+    """Assemble a multipart document upload and register the document"""
+    upload_dir, upload = load_multipart_upload(upload_id, current_user['email'])
+
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    # mkdir is atomic, so only one concurrent complete gets past this point
+    completing_marker = os.path.join(upload_dir, 'completing')
+    try:
+        os.mkdir(completing_marker)
+    except FileExistsError:
+        return jsonify({'error': 'Upload is already being completed'}), 409
+
+    # Parts were written in place, so completing is a rename rather than a copy
+    data_path = os.path.join(upload_dir, 'data')
+    file_path = document_file_path(upload['shipment_id'], upload['filename'])
+    fd = os.open(data_path, os.O_RDONLY)
+    try:
+        # Fails rather than waits while a part is still being written
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.rmdir(completing_marker)
+            return jsonify({'error': 'Parts are still uploading'}), 409
+
+        missing = [
+            part_no for part_no in range(1, upload['part_count'] + 1)
+            if not os.path.exists(os.path.join(upload_dir, f'part_{part_no}'))
+        ]
+        if missing:
+            os.rmdir(completing_marker)
+            return jsonify({'error': 'Upload incomplete', 'missing_parts': missing}), 400
+
+        result = db.session.execute(
+            INSERT_DOCUMENT_Q,
+            {
+                'shipment_id': upload['shipment_id'],
+                'document_type': upload['document_type'],
+                'document_name': upload['filename'],
+                'file_path': file_path,
+                'file_size': upload['total_size'],
+                'mime_type': upload['mime_type'],
+                'uploaded_by': upload['uploaded_by'],
+                'upload_source': upload['upload_source']
+            }
+        )
+        document_id = result.fetchone()[0]
+
+        os.rename(data_path, file_path)
+        try:
+            db.session.commit()
+        except Exception:
+            os.rename(file_path, data_path)
+            raise
+    except Exception:
+        # Leave the staged upload intact so the client can retry
+        db.session.rollback()
+        os.rmdir(completing_marker)
+        raise
+    finally:
+        os.close(fd)
+
+    shutil.rmtree(upload_dir, ignore_errors=True)
+
+    return jsonify({
+        'message': 'Document uploaded successfully',
+        'document_id': document_id
+    }), 201
+
+
+@app.route('/api/shipments/<int:shipment_id>/documents/presign', methods=['POST'])
+@jwt_required()
+def presign_document_upload(shipment_id):
+    """Issue presigned S3 URLs so the client uploads a document directly"""
+    if s3 is None:
+        return jsonify({'error': 'Direct uploads are not configured'}), 501
+
+    data = request.get_json()
+
+    filename = data.get('filename')
+    size = data.get('size')
+
+    if not filename or not data.get('document_type') or not isinstance(size, int):
+        return jsonify({'error': 'filename, document_type and size required'}), 400
+
+    if not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    if size <= 0 or size > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'Invalid file size'}), 400
+
+    filename = secure_filename(filename)
+    key = s3_document_key(shipment_id, current_user['user_id'], filename)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    if size <= S3_MULTIPART_THRESHOLD:
+        upload_url = s3.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': S3_BUCKET, 'Key': key, 'ContentType': content_type},
+            ExpiresIn=S3_PRESIGN_EXPIRES
+        )
+        return jsonify({'key': key, 'upload_url': upload_url}), 200
+
+    # Large files go up as parallel parts, completed in finalize
+    upload_id = s3.create_multipart_upload(
+        Bucket=S3_BUCKET, Key=key, ContentType=content_type
+    )['UploadId']
+    part_count = math.ceil(size / MULTIPART_PART_SIZE)
+    part_urls = [
+        s3.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': S3_BUCKET, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_no},
+            ExpiresIn=S3_PRESIGN_EXPIRES
+        )
+        for part_no in range(1, part_count + 1)
+    ]
+
+    return jsonify({
+        'key': key,
+        'upload_id': upload_id,
+        'part_size': MULTIPART_PART_SIZE,
+        'part_urls': part_urls
+    }), 200
+
+
+@app.route('/api/shipments/<int:shipment_id>/documents/finalize', methods=['POST'])
+@jwt_required()
+def finalize_document_upload(shipment_id):
+    """Register a document the client has finished uploading to S3"""
+    if s3 is None:
+        return jsonify({'error': 'Direct uploads are not configured'}), 501
+
+    data = request.get_json()
+
+    key = data.get('key', '')
+    document_type = data.get('document_type')
+
+    if not document_type:
+        return jsonify({'error': 'document_type required'}), 400
+
+    # Only keys presign issued to this user for this shipment
+    prefix = s3_key_prefix(shipment_id, current_user['user_id'])
+    name = key[len(prefix):] if isinstance(key, str) and key.startswith(prefix) else ''
+    if '/' in name or '_' not in name:
+        return jsonify({'error': 'Invalid key'}), 400
+
+    file_path = f"s3://{S3_BUCKET}/{key}"
+    if db.session.execute(DOCUMENT_BY_PATH_Q, {'file_path': file_path}).fetchone():
+        return jsonify({'error': 'Document already registered'}), 409
+
+    if data.get('upload_id'):
+        parts = data.get('parts')
+        if not isinstance(parts, list) or not parts or not all(
+            isinstance(part, dict)
+            and isinstance(part.get('part_no'), int)
+            and isinstance(part.get('etag'), str)
+            for part in parts
+        ):
+            return jsonify({'error': 'parts must list part_no and etag for each part'}), 400
+
+        try:
+            s3.complete_multipart_upload(
+                Bucket=S3_BUCKET,
+                Key=key,
+                UploadId=data['upload_id'],
+                MultipartUpload={'Parts': [
+                    {'PartNumber': part['part_no'], 'ETag': part['etag']}
+                    for part in sorted(parts, key=lambda part: part['part_no'])
+                ]}
+            )
+        except ClientError as e:
+            # Free the uploaded parts; the client starts over with a new presign
+            try:
+                s3.abort_multipart_upload(Bucket=S3_BUCKET, Key=key, UploadId=data['upload_id'])
+            except ClientError:
+                logger.exception("Failed to abort multipart upload for %s", key)
+            return jsonify({'error': f"Upload could not be completed: {e.response['Error'].get('Code')}"}), 409
+
+    # Size and type come from S3 rather than the client
+    try:
+        head = s3.head_object(Bucket=S3_BUCKET, Key=key)
+    except ClientError:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    if head['ContentLength'] > app.config['MAX_CONTENT_LENGTH']:
+        s3.delete_object(Bucket=S3_BUCKET, Key=key)
+        return jsonify({'error': 'File too large'}), 413
+
+    try:
+        result = db.session.execute(
+            INSERT_DOCUMENT_Q,
+            {
+                'shipment_id': shipment_id,
+                'document_type': document_type,
+                'document_name': name.split('_', 1)[1],
+                'file_path': file_path,
+                'file_size': head['ContentLength'],
+                'mime_type': head.get('ContentType'),
+                'uploaded_by': current_user['email'],
+                'upload_source': current_user['team']
+            }
+        )
+        document_id = result.fetchone()[0]
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        # A concurrent finalize of the same key got there first
+        if e.orig.diag.constraint_name == 'idx_documents_s3_path':
+            return jsonify({'error': 'Document already registered'}), 409
+        raise
+
+    return jsonify({
+        'message': 'Document uploaded successfully',
+        'document_id': document_id
+    }), 201
+
+
 @app.route('/api/documents/<int:document_id>/download', methods=['GET'])
 @jwt_required()
 def download_document(document_id):
     """Download a document"""
-    query = "SELECT file_path, document_name FROM documents WHERE document_id = %s"
-    result = db.session.execute(query, (document_id,)).fetchone()
+    result = db.session.execute(DOCUMENT_FILE_Q, {'document_id': document_id}).fetchone()
 
     if not result:
         return jsonify({'error': 'Document not found'}), 404
 
     file_path, document_name = result
+
+    if file_path.startswith('s3://'):
+        if s3 is None:
+            return jsonify({'error': 'File not found on server'}), 404
+        bucket, key = parse_s3_path(file_path)
+        download_url = s3.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': bucket,
+                'Key': key,
+                'ResponseContentDisposition': f'attachment; filename="{document_name}"'
+            },
+            ExpiresIn=S3_PRESIGN_EXPIRES
+        )
+        return redirect(download_url, code=302)
+
     if not os.path.exists(file_path):
         return jsonify({'error': 'File not found on server'}), 404
 
-    return send_file(file_path, as_attachment=True, download_name=document_name)
+    accel_prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+    if accel_prefix:
+        relative_path = os.path.relpath(file_path, app.config['UPLOAD_FOLDER'])
+        response = app.response_class(status=200)
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{relative_path}"
+        response.headers.set('Content-Disposition', 'attachment', filename=document_name)
+        return response
+
+    return send_file(
+        file_path,
+        as_attachment=True,
+        download_name=document_name,
+        conditional=True,
+        etag=True,
+        last_modified=os.path.getmtime(file_path)
+    )
 
 
 # ==================== INVOICE ROUTES ====================
@@ -494,30 +1258,9 @@ def download_document(document_id):
 @jwt_required()
 def get_shipment_invoices(shipment_id):
     """Get all invoices for a shipment"""
-    query = """
-        SELECT
-            invoice_id, invoice_number, invoice_date, invoice_type,
-            total_amount, currency, payment_status
-        FROM invoices
-        WHERE shipment_id = %s
-        ORDER BY invoice_date DESC
-    """
-
-    results = db.session.execute(query, (shipment_id,)).fetchall()
+    result = db.session.execute(INVOICE_LIST_Q, {'shipment_id': shipment_id}).fetchone()
 
-    invoices = []
-    for row in results:
-        invoices.append({
-            'invoice_id': row[0],
-            'invoice_number': row[1],
-            'invoice_date': row[2].isoformat() if row[2] else None,
-            'invoice_type': row[3],
-            'total_amount': float(row[4]) if row[4] else 0,
-            'currency': row[5],
-            'payment_status': row[6]
-        })
-
-    return jsonify({'invoices': invoices}), 200
+    return json_text_response(result)
 
 
 @app.route('/api/invoices', methods=['POST'])
@@ -526,68 +1269,71 @@ def create_invoice():
     """Create new invoice"""
     data = request.get_json()
 
-    required_fields = ['shipment_id', 'invoice_number', 'total_amount']
-    if not all(field in data for field in required_fields):
+    if not all(field in data for field in INVOICE_REQUIRED_FIELDS):
         return jsonify({'error': 'Missing required fields'}), 400
 
-    query = """
-        INSERT INTO invoices (
-            shipment_id, invoice_number, invoice_date, invoice_type,
-            freight_charges, customs_clearance, documentation_fee,
-            handling_charges, rail_charges, other_charges, total_amount, currency
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING invoice_id
-    """
-
-    result = db.session.execute(
-        query,
-        (data['shipment_id'], data['invoice_number'], datetime.utcnow(),
-         data.get('invoice_type', 'FINAL'),
-         data.get('freight_charges', 0), data.get('customs_clearance', 0),
-         data.get('documentation_fee', 0), data.get('handling_charges', 0),
-         data.get('rail_charges', 0), data.get('other_charges', 0),
-         data['total_amount'], data.get('currency', 'USD'))
-    )
+    result = db.session.execute(INSERT_INVOICE_Q, invoice_params(data, datetime.utcnow()))
     invoice_id = result.fetchone()[0]
     db.session.commit()
 
     return jsonify({'message': 'Invoice created', 'invoice_id': invoice_id}), 201
 
 
-# ==================== DASHBOARD ROUTES ====================
+@app.route('/api/invoices/bulk', methods=['POST'])
+@role_required(['SEAIR_US', 'ADMIN'])
+def create_invoices_bulk():
+    """Create many invoices in a single multi-row INSERT"""
+    data = request.get_json()
 
-@app.route('/api/dashboard/stats', methods=['GET'])
-@jwt_required()
-def get_dashboard_stats():
-    """Get dashboard statistics"""
-    stats = {}
+    if not isinstance(data, list) or not data:
+        return jsonify({'error': 'Expected a non-empty list of invoices'}), 400
 
-    # Total active shipments
-    result = db.session.execute(
-        "SELECT COUNT(*) FROM shipments WHERE current_status != 'COMPLETED'"
-    ).fetchone()
-    stats['active_shipments'] = result[0]
+    for index, invoice in enumerate(data):
+        if not isinstance(invoice, dict) or not all(field in invoice for field in INVOICE_REQUIRED_FIELDS):
+            return jsonify({'error': 'Missing required fields', 'index': index}), 400
 
-    # Shipments by status
-    results = db.session.execute(
-        "SELECT current_status, COUNT(*) FROM shipments GROUP BY current_status"
-    ).fetchall()
-    stats['by_status'] = {row[0]: row[1] for row in results}
+    invoice_date = datetime.utcnow()
+    rows = [invoice_params(invoice, invoice_date) for invoice in data]
 
-    # Pending exceptions
-    result = db.session.execute(
-        "SELECT COUNT(*) FROM exceptions WHERE status != 'RESOLVED'"
-    ).fetchone()
-    stats['pending_exceptions'] = result[0]
+    # Run on the session's own DBAPI connection so the insert shares its transaction
+    cursor = db.session.connection().connection.cursor()
+    try:
+        results = execute_values(
+            cursor, INSERT_INVOICES_BULK_SQL, rows,
+            template=INVOICE_VALUES_TEMPLATE, page_size=500, fetch=True
+        )
+    finally:
+        cursor.close()
+    db.session.commit()
 
-    # Recent milestones (last 7 days)
-    result = db.session.execute(
-        """SELECT COUNT(*) FROM milestones
-           WHERE actual_date > NOW() - INTERVAL '7 days'"""
-    ).fetchone()
-    stats['recent_milestones'] = result[0]
+    return jsonify({
+        'message': f'{len(results)} invoices created',
+        'invoice_ids': [row[0] for row in results]
+    }), 201
+
+
+# ==================== DASHBOARD ROUTES ====================
+
+@cache.cached(timeout=30, key_prefix=DASHBOARD_STATS_CACHE_KEY)
+def load_dashboard_stats():
+    """Compute dashboard statistics (cached briefly, invalidated on writes)"""
+    result = db.session.execute(DASHBOARD_STATS_Q).fetchone()
+
+    stats = {
+        'active_shipments': result[0],
+        'by_status': result[1],
+        'pending_exceptions': result[2],
+        'recent_milestones': result[3]
+    }
 
-    return jsonify(stats), 200
+    return stats
+
+
+@app.route('/api/dashboard/stats', methods=['GET'])
+@jwt_required()
+def get_dashboard_stats():
+    """Get dashboard statistics"""
+    return jsonify(load_dashboard_stats()), 200
 
 
 # ==================== EXCEPTION ROUTES ====================
@@ -597,38 +1343,33 @@ def get_dashboard_stats():
 def create_exception(shipment_id):
     """Create exception/alert for shipment"""
     data = request.get_json()
-    current_user = get_jwt_identity()
-
-    query = """
-        INSERT INTO exceptions (
-            shipment_id, exception_type, severity, title, description,
-            reported_by, status
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-        RETURNING exception_id
-    """
 
     result = db.session.execute(
-        query,
-        (shipment_id, data.get('exception_type'), data.get('severity', 'MEDIUM'),
-         data['title'], data.get('description'), current_user['email'], 'OPEN')
+        INSERT_EXCEPTION_Q,
+        {
+            'shipment_id': shipment_id,
+            'exception_type': data.get('exception_type'),
+            'severity': data.get('severity', 'MEDIUM'),
+            'title': data['title'],
+            'description': data.get('description'),
+            'reported_by': current_user['email'],
+            'status': 'OPEN'
+        }
     )
-    exception_id = result.fetchone()[0]
+    exception_id, booking_number = result.fetchone()
     db.session.commit()
+    invalidate_dashboard_stats()
 
     # Send alert
-    shipment = db.session.execute(
-        "SELECT booking_number FROM shipments WHERE shipment_id = %s",
-        (shipment_id,)
-    ).fetchone()
-
-    send_notification_email(
+    enqueue_notification_email(
         ['vhc-team@example.com', 'seair-ops@example.com'],
         f'Exception Alert: {data["title"]}',
-        f'Exception reported for shipment {shipment[0]}: {data.get("description")}'
+        f'Exception reported for shipment {booking_number}: {data.get("description")}'
     )
 
     return jsonify({'message': 'Exception created', 'exception_id': exception_id}), 201
 
 
 if __name__ == '__main__':
+    # Local development only; production runs under gunicorn (see wsgi.py)
     app.run(debug=True, host='0.0.0.0', port=5000)
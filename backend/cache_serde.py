@@ -0,0 +1,26 @@
+"""
+VHC Shipment Management System - Redis payload serialization
+msgpack encoding shared by everything the backend stores in Redis
+"""
+
+import msgpack
+
+
+def dumps(value):
+    return msgpack.packb(value, use_bin_type=True, datetime=True)
+
+
+def loads(data):
+    return msgpack.unpackb(data, raw=False, timestamp=3)
+
+
+class MsgpackSerializer:
+    """Drop-in replacement for cachelib's pickle-based Redis serializer"""
+
+    def dumps(self, value):
+        return dumps(value)
+
+    def loads(self, value):
+        if value is None:
+            return None
+        return loads(value)
@@ -1,5 +1,8 @@
 -- VHC Shipment Management System Database Schema
 
+-- Trigram matching backs the ILIKE '%...%' filters on the shipments listing
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Shippers Table
 CREATE TABLE shippers (
     shipper_id SERIAL PRIMARY KEY,
@@ -214,13 +217,19 @@ CREATE TABLE audit_log (
 CREATE INDEX idx_shipments_booking ON shipments(booking_number);
 CREATE INDEX idx_shipments_status ON shipments(current_status);
 CREATE INDEX idx_shipments_container ON shipments(container_number);
+CREATE INDEX idx_shipments_created_at ON shipments(created_at DESC);
+CREATE INDEX idx_shipments_booking_trgm ON shipments USING gin (booking_number gin_trgm_ops);
+CREATE INDEX idx_shipments_container_trgm ON shipments USING gin (container_number gin_trgm_ops);
 CREATE INDEX idx_po_shipment ON purchase_orders(shipment_id);
 CREATE INDEX idx_documents_shipment ON documents(shipment_id);
 CREATE INDEX idx_documents_type ON documents(document_type);
+CREATE UNIQUE INDEX idx_documents_s3_path ON documents(file_path) WHERE file_path LIKE 's3://%';
 CREATE INDEX idx_milestones_shipment ON milestones(shipment_id);
+CREATE INDEX idx_milestones_unsent ON milestones(actual_date DESC) WHERE notification_sent = FALSE AND milestone_status = 'COMPLETED';
 CREATE INDEX idx_notifications_shipment ON notifications(shipment_id);
 CREATE INDEX idx_exceptions_shipment ON exceptions(shipment_id);
 CREATE INDEX idx_exceptions_status ON exceptions(status);
+CREATE INDEX idx_exceptions_open_recent ON exceptions(created_at DESC) WHERE status = 'OPEN';
 
 -- Create triggers for updated_at timestamps
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -239,3 +248,30 @@ CREATE TRIGGER update_milestones_updated_at BEFORE UPDATE ON milestones FOR EACH
 CREATE TRIGGER update_invoices_updated_at BEFORE UPDATE ON invoices FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_exceptions_updated_at BEFORE UPDATE ON exceptions FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Push new work to the notification service instead of waiting for its poll
+CREATE OR REPLACE FUNCTION notify_milestone_completed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.milestone_status = 'COMPLETED'
+       AND NOT COALESCE(NEW.notification_sent, FALSE)
+       AND (TG_OP = 'INSERT' OR OLD.milestone_status IS DISTINCT FROM NEW.milestone_status) THEN
+        PERFORM pg_notify('milestone_completed', NEW.milestone_id::text);
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION notify_exception_open()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status = 'OPEN'
+       AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM NEW.status) THEN
+        PERFORM pg_notify('exception_open', NEW.exception_id::text);
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_milestones_completed AFTER INSERT OR UPDATE OF milestone_status ON milestones FOR EACH ROW EXECUTE FUNCTION notify_milestone_completed();
+CREATE TRIGGER notify_exceptions_open AFTER INSERT OR UPDATE OF status ON exceptions FOR EACH ROW EXECUTE FUNCTION notify_exception_open();
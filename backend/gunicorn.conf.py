@@ -0,0 +1,13 @@
+"""
+Gunicorn configuration for the VHC Shipment Management API
+"""
+
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '1000'))
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
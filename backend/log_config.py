@@ -0,0 +1,28 @@
+"""
+VHC Shipment Management System - logging setup
+Shared by the API and the notification service entrypoints
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+def configure_logging():
+    """Send log records through a queue so request threads and the event loop never wait on handler I/O"""
+    log_queue = queue.SimpleQueue()
+    log_file = os.getenv('LOG_FILE')
+    if log_file:
+        handler = RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO'))
+    listener.start()
+    atexit.register(listener.stop)
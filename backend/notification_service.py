@@ -1,27 +1,282 @@
 """
 Automated Milestone Notification Service
 Monitors shipments and sends automated notifications to VHC team
+
+Runs as its own process with its own dependencies:
+
+    pip install -r requirements-notifications.txt
 """
 
 import os
-import smtplib
-import schedule
+import asyncio
+import logging
+import random
+import re
 import time
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
-import psycopg2
-from psycopg2.extras import DictCursor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from email.message import EmailMessage
+from datetime import datetime, timedelta, timezone
+import aiosmtplib
+import psycopg
+import jinja2
+from markupsafe import Markup
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Flags unsent milestones as notified and returns them in one statement.
+# SKIP LOCKED lets several service instances claim disjoint batches; once
+# the claim commits, other instances no longer see the rows as unsent.
+CLAIM_MILESTONES_SQL = """
+    WITH claimed AS (
+        UPDATE milestones SET notification_sent = TRUE
+        WHERE milestone_id IN (
+            SELECT milestone_id FROM milestones
+            WHERE notification_sent = FALSE
+              AND milestone_status = 'COMPLETED'
+              AND {where}
+            LIMIT 500
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING milestone_id, milestone_name, actual_date, location, notes, shipment_id
+    )
+    SELECT
+        c.milestone_id, c.milestone_name, c.actual_date, c.location, c.notes,
+        s.shipment_id, s.booking_number, s.container_number, s.vessel_name
+    FROM claimed c
+    JOIN shipments s ON c.shipment_id = s.shipment_id
+    ORDER BY c.actual_date DESC
+"""
+
+CLAIM_RECENT_MILESTONES_QUERY = CLAIM_MILESTONES_SQL.format(
+    where="actual_date > NOW() - INTERVAL '15 minutes'"
+)
+
+CLAIM_MILESTONES_BY_ID_QUERY = CLAIM_MILESTONES_SQL.format(where="milestone_id = ANY(%s)")
+
+EXCEPTION_SQL = """
+    SELECT
+        e.exception_id, e.exception_type, e.severity, e.title, e.description,
+        e.status, e.created_at,
+        s.booking_number, s.container_number, s.vessel_name
+    FROM exceptions e
+    JOIN shipments s ON e.shipment_id = s.shipment_id
+    WHERE e.status = 'OPEN'
+      AND {where}
+"""
+
+RECENT_EXCEPTIONS_QUERY = EXCEPTION_SQL.format(
+    where="e.created_at > NOW() - INTERVAL '15 minutes'"
+)
+
+EXCEPTIONS_BY_ID_QUERY = EXCEPTION_SQL.format(where="e.exception_id = ANY(%s)")
+
+# Headline counts in one round-trip; the "today" filters are half-open
+# ranges so they can use indexes on the timestamps
+DAILY_STATS_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM shipments
+         WHERE current_status <> 'COMPLETED') AS active,
+        (SELECT COUNT(*) FROM milestones
+         WHERE actual_date >= CURRENT_DATE AND actual_date < CURRENT_DATE + 1) AS milestones_today,
+        (SELECT COUNT(*) FROM exceptions
+         WHERE status <> 'RESOLVED') AS open_exceptions,
+        (SELECT COUNT(*) FROM documents
+         WHERE created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + 1) AS docs_today
+"""
+
+RECENT_SHIPMENTS_QUERY = """
+    SELECT booking_number, container_number, current_milestone, current_status
+    FROM shipments
+    WHERE current_status != 'COMPLETED'
+    ORDER BY updated_at DESC
+    LIMIT 10
+"""
+
+# NOTIFY events are handled once the channel has been quiet this long, so a
+# bulk import costs one claim query rather than one per row; a steady stream
+# is still flushed at least every NOTIFY_MAX_DELAY seconds
+NOTIFY_DEBOUNCE = 0.2
+NOTIFY_MAX_DELAY = 2.0
+
+# Batches at least this large are sent as a single digest email
+DIGEST_THRESHOLD = int(os.getenv('DIGEST_THRESHOLD', '5'))
+
+# Exceptions stay inside the fallback poll's 15-minute window for a while,
+# so remember what was already alerted for at least that long
+ALERTED_EXCEPTION_TTL = 20 * 60
+
+# Transient 4xx SMTP replies ("try again later"); 5xx replies are permanent
+SMTP_TRANSIENT_CODES = (421, 450, 452, 454)
+SMTP_MAX_RETRIES = 5
+
+
+async def every(interval, job):
+    """Run a job now and then again `interval` seconds after each run"""
+    while True:
+        await job()
+        await asyncio.sleep(interval)
+
+
+async def daily_at(time_of_day, job):
+    """Run a job every day at `time_of_day` ("HH:MM", UTC)"""
+    hour, minute = map(int, time_of_day.split(':'))
+    while True:
+        now = datetime.now(timezone.utc)
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        await job()
+
+
+class SmtpSession:
+    """An authenticated SMTP session kept open across batches"""
+
+    def __init__(self, smtp_config):
+        self.smtp_config = smtp_config
+        self.server = None
+
+    async def connect(self):
+        server = aiosmtplib.SMTP(
+            hostname=self.smtp_config['server'],
+            port=self.smtp_config['port'],
+            start_tls=True
+        )
+        await server.connect()
+        await server.login(self.smtp_config['user'], self.smtp_config['password'])
+        self.server = server
+
+    async def warm_up(self):
+        """Log in ahead of the first send; a failure here is retried on send"""
+        if self.server is None:
+            try:
+                await self.connect()
+            except (aiosmtplib.SMTPException, OSError) as e:
+                logger.warning("SMTP warm-up failed: %s", e)
+
+    async def close(self):
+        server, self.server = self.server, None
+        if server is not None:
+            try:
+                await server.quit()
+            except aiosmtplib.SMTPException:
+                pass
+
+    async def send_message(self, msg, recipients):
+        """Send over the open session, backing off when the server throttles us"""
+        for attempt in range(SMTP_MAX_RETRIES + 1):
+            try:
+                return await self._send_once(msg, recipients)
+            except aiosmtplib.SMTPResponseException as e:
+                if e.code not in SMTP_TRANSIENT_CODES or attempt == SMTP_MAX_RETRIES:
+                    raise
+                # 421 closes the session; start clean for the other codes too
+                await self.close()
+                await asyncio.sleep(2 ** attempt + random.random())
+
+    async def _send_once(self, msg, recipients):
+        """Send over the open session, reconnecting once if the server dropped it"""
+        if self.server is None:
+            await self.connect()
+        try:
+            await self.server.send_message(msg, recipients=recipients)
+        except aiosmtplib.SMTPServerDisconnected:
+            await self.close()
+            await self.connect()
+            await self.server.send_message(msg, recipients=recipients)
+
+
+class SmtpPool:
+    """A fixed number of SMTP sessions, which bounds how many sends run at once"""
+
+    def __init__(self, smtp_config, size):
+        self.sessions = asyncio.Queue()
+        for _ in range(size):
+            self.sessions.put_nowait(SmtpSession(smtp_config))
+
+    @asynccontextmanager
+    async def session(self):
+        server = await self.sessions.get()
+        try:
+            yield server
+        finally:
+            self.sessions.put_nowait(server)
+
+
+def minify_css(css):
+    """Collapse whitespace in a stylesheet"""
+    css = re.sub(r'\s+', ' ', css)
+    return Markup(re.sub(r' ?([{};:,]) ?', r'\1', css).strip())
 
 
 class NotificationService:
+    # Shared email stylesheets, minified once at import
+    MILESTONE_CSS = minify_css("""
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+    .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+    .header { background-color: #1e3a8a; color: white; padding: 20px; text-align: center; }
+    .content { background-color: #f9fafb; padding: 20px; margin-top: 20px; border-radius: 8px; }
+    .info-row { margin: 10px 0; padding: 10px; background-color: white; border-left: 4px solid #1e3a8a; }
+    .label { font-weight: bold; color: #1e3a8a; }
+    .footer { margin-top: 20px; padding: 20px; text-align: center; color: #6b7280; font-size: 12px; }
+    .milestone { background-color: #10b981; color: white; padding: 10px 20px; border-radius: 5px; display: inline-block; margin: 10px 0; }
+    """)
+
+    EXCEPTION_CSS = minify_css("""
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+    .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+    .header { color: white; padding: 20px; text-align: center; }
+    .content { background-color: #f9fafb; padding: 20px; margin-top: 20px; border-radius: 8px; }
+    .alert { background-color: #fee2e2; border-left: 4px solid #dc2626; padding: 15px; margin: 15px 0; }
+    .info-row { margin: 10px 0; padding: 10px; background-color: white; }
+    .label { font-weight: bold; }
+    .footer { margin-top: 20px; padding: 20px; text-align: center; color: #6b7280; font-size: 12px; }
+    """)
+
+    SUMMARY_CSS = minify_css("""
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+    .container { max-width: 700px; margin: 0 auto; padding: 20px; }
+    .header { background-color: #1e3a8a; color: white; padding: 20px; text-align: center; }
+    .stats { display: flex; justify-content: space-around; margin: 20px 0; }
+    .stat-box { background-color: #f3f4f6; padding: 20px; border-radius: 8px; text-align: center; flex: 1; margin: 0 10px; }
+    .stat-number { font-size: 36px; font-weight: bold; color: #1e3a8a; }
+    .stat-label { color: #6b7280; margin-top: 5px; }
+    table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+    th { background-color: #1e3a8a; color: white; padding: 12px; text-align: left; }
+    .footer { margin-top: 20px; padding: 20px; text-align: center; color: #6b7280; font-size: 12px; }
+    """)
+
+    DIGEST_CSS = minify_css("""
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+    .container { max-width: 800px; margin: 0 auto; padding: 20px; }
+    .header { background-color: #1e3a8a; color: white; padding: 20px; text-align: center; }
+    table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+    th { background-color: #1e3a8a; color: white; padding: 12px; text-align: left; }
+    td { padding: 8px; border-bottom: 1px solid #e5e7eb; }
+    .footer { margin-top: 20px; padding: 20px; text-align: center; color: #6b7280; font-size: 12px; }
+    """)
+
     def __init__(self):
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'database': os.getenv('DB_NAME', 'vhc_shipments'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD', '')
-        }
+        self.conninfo = make_conninfo(
+            host=os.getenv('DB_HOST', 'localhost'),
+            dbname=os.getenv('DB_NAME', 'vhc_shipments'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', '')
+        )
 
         self.smtp_config = {
             'server': os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
@@ -31,167 +286,264 @@ class NotificationService:
             'from_email': os.getenv('SMTP_FROM', 'notifications@seaironline.com')
         }
 
-        # VHC notification recipients
-        self.vhc_recipients = os.getenv('VHC_EMAILS', 'vhc-team@example.com').split(',')
-
-    def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_config)
-
-    def send_email(self, recipients, subject, html_content):
-        """Send email notification"""
+        # VHC notification recipients, snapshotted once at startup
+        self.vhc_recipients = tuple(os.getenv('VHC_EMAILS', 'vhc-team@example.com').split(','))
+        self.escalation_recipients = tuple(
+            e for e in os.getenv('ESCALATION_EMAILS', '').split(',') if e
+        )
+
+        # Email templates are compiled once; autoescape keeps user-entered
+        # notes and descriptions from injecting markup
+        env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
+            autoescape=True
+        )
+        self.tmpl_milestone = env.get_template(
+            'milestone.html.j2', globals={'css': self.MILESTONE_CSS}
+        )
+        self.tmpl_exception = env.get_template(
+            'exception.html.j2', globals={'css': self.EXCEPTION_CSS}
+        )
+        self.tmpl_daily_summary = env.get_template(
+            'daily_summary.html.j2', globals={'css': self.SUMMARY_CSS}
+        )
+        self.tmpl_milestone_digest = env.get_template(
+            'milestone_digest.html.j2', globals={'css': self.DIGEST_CSS}
+        )
+
+        # exception_id -> time alerted, shared by the LISTEN and polling paths
+        self.alerted_exceptions = {}
+
+        # Created in start(), once the event loop is running
+        self.pool = None
+        self.smtp_pool = None
+
+        # Row ids announced via NOTIFY and not yet handled
+        self.pending_milestones = set()
+        self.pending_exceptions = set()
+        self.first_notify = self.last_notify = None
+        self.notified = None
+
+    async def start(self):
+        """Open the database pool and SMTP sessions"""
+        self.pool = AsyncConnectionPool(
+            self.conninfo,
+            min_size=2,
+            max_size=int(os.getenv('DB_POOL', '10')),
+            kwargs={'row_factory': dict_row},
+            open=False
+        )
+        await self.pool.open()
+        self.notified = asyncio.Event()
+        self.smtp_pool = SmtpPool(self.smtp_config, int(os.getenv('SMTP_CONCURRENCY', '4')))
+
+    async def fetch(self, query, params=None):
+        """Run a query on a pooled connection and return every row"""
+        # The queries are fixed module constants, so prepare them server-side
+        # on first use; results come back in the binary format
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(query, params, prepare=True, binary=True)
+            return await cursor.fetchall()
+
+    async def fetchone(self, query, params=None):
+        """Run a query on a pooled connection and return the first row"""
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(query, params, prepare=True, binary=True)
+            return await cursor.fetchone()
+
+    async def send_email(self, recipients, subject, html_content, server=None):
+        """Send email notification, over `server` if a session is already open"""
         try:
-            msg = MIMEMultipart('alternative')
+            msg = EmailMessage()
             msg['From'] = self.smtp_config['from_email']
             msg['To'] = ', '.join(recipients)
             msg['Subject'] = subject
+            msg.set_content(html_content, subtype='html')
 
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-
-            with smtplib.SMTP(self.smtp_config['server'], self.smtp_config['port']) as server:
-                server.starttls()
-                server.login(self.smtp_config['user'], self.smtp_config['password'])
-                server.send_message(msg)
+            if server is not None:
+                await server.send_message(msg, recipients)
+            else:
+                async with self.smtp_pool.session() as server:
+                    await server.send_message(msg, recipients)
 
-            print(f"Email sent: {subject}")
+            logger.info("Email sent: %s", subject)
             return True
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
+        except Exception:
+            logger.exception("Error sending email %r", subject)
             return False
 
-    def check_new_milestones(self):
+    async def deliver_milestones(self, claim_query, params=None):
+        """Claim milestones, email them, and release any that failed to send"""
+        # Claim in a short transaction of its own; nothing stays locked or
+        # pinned to a pooled connection while SMTP sends (and retries) run
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(claim_query, params, prepare=True, binary=True)
+            milestones = await cursor.fetchall()
+
+        if len(milestones) >= DIGEST_THRESHOLD:
+            # A burst goes out as one email listing every milestone
+            sent = await self.send_milestone_digest(milestones)
+            results = [sent] * len(milestones)
+        else:
+            # Sends run concurrently, bounded by the SMTP pool size
+            results = await asyncio.gather(
+                *(self.send_milestone_notification(milestone) for milestone in milestones),
+                return_exceptions=True
+            )
+
+        # Failed sends go back to unsent so the next poll retries them
+        failed_ids = [
+            milestone['milestone_id']
+            for milestone, sent in zip(milestones, results)
+            if sent is not True
+        ]
+        if failed_ids:
+            async with self.pool.connection() as conn:
+                await conn.execute(
+                    "UPDATE milestones SET notification_sent = FALSE WHERE milestone_id = ANY(%s)",
+                    (failed_ids,)
+                )
+
+        return milestones
+
+    async def check_new_milestones(self):
         """Check for new milestones and send notifications"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
+        try:
+            # Milestones from last 15 minutes that haven't been notified
+            new_milestones = await self.deliver_milestones(CLAIM_RECENT_MILESTONES_QUERY)
+
+            logger.info("Processed %d new milestones", len(new_milestones))
 
+        except Exception:
+            logger.exception("Error checking milestones")
+
+    async def notify_milestones(self, milestone_ids):
+        """Send notifications for milestones announced via NOTIFY"""
         try:
-            # Get milestones from last 15 minutes that haven't been notified
-            query = """
-                SELECT
-                    m.milestone_id, m.milestone_name, m.actual_date, m.location, m.notes,
-                    s.shipment_id, s.booking_number, s.container_number, s.vessel_name
-                FROM milestones m
-                JOIN shipments s ON m.shipment_id = s.shipment_id
-                WHERE m.notification_sent = FALSE
-                  AND m.milestone_status = 'COMPLETED'
-                  AND m.actual_date > NOW() - INTERVAL '15 minutes'
-                ORDER BY m.actual_date DESC
-            """
-
-            cursor.execute(query)
-            new_milestones = cursor.fetchall()
-
-            for milestone in new_milestones:
-                self.send_milestone_notification(milestone)
-
-                # Mark as notified
-                cursor.execute(
-                    "UPDATE milestones SET notification_sent = TRUE WHERE milestone_id = %s",
-                    (milestone['milestone_id'],)
-                )
-                conn.commit()
+            # Claims nothing for rows the fallback poll already handled
+            await self.deliver_milestones(CLAIM_MILESTONES_BY_ID_QUERY, (milestone_ids,))
 
-            print(f"Processed {len(new_milestones)} new milestones")
+        except Exception:
+            logger.exception("Error notifying milestones %s", milestone_ids)
 
-        except Exception as e:
-            print(f"Error checking milestones: {str(e)}")
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
+    async def notify_exceptions(self, exception_ids):
+        """Send alerts for exceptions announced via NOTIFY"""
+        try:
+            exceptions = await self.fetch(EXCEPTIONS_BY_ID_QUERY, (exception_ids,))
+
+            await asyncio.gather(
+                *(self.alert_exception_once(exception) for exception in exceptions),
+                return_exceptions=True
+            )
+
+        except Exception:
+            logger.exception("Error notifying exceptions %s", exception_ids)
+
+    async def alert_exception_once(self, exception):
+        """Send an exception alert unless it was sent recently"""
+        now = time.monotonic()
+        self.alerted_exceptions = {
+            exception_id: alerted_at
+            for exception_id, alerted_at in self.alerted_exceptions.items()
+            if now - alerted_at < ALERTED_EXCEPTION_TTL
+        }
+        if exception['exception_id'] in self.alerted_exceptions:
+            return
+
+        # Claim it before awaiting so a concurrent NOTIFY/poll can't send it too
+        self.alerted_exceptions[exception['exception_id']] = now
+        if not await self.send_exception_alert(exception):
+            del self.alerted_exceptions[exception['exception_id']]
 
-    def send_milestone_notification(self, milestone):
+    def queue_notification(self, channel, payload):
+        """Record a NOTIFY payload for the next drain_notifications pass"""
+        try:
+            row_id = int(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed %s payload: %r", channel, payload)
+            return
+
+        if channel == 'milestone_completed':
+            self.pending_milestones.add(row_id)
+        elif channel == 'exception_open':
+            self.pending_exceptions.add(row_id)
+        else:
+            return
+
+        now = time.monotonic()
+        if self.first_notify is None:
+            self.first_notify = now
+        self.last_notify = now
+        self.notified.set()
+
+    async def drain_notifications(self):
+        """Handle queued NOTIFY events in batches once each burst settles"""
+        while True:
+            await self.notified.wait()
+
+            while True:
+                now = time.monotonic()
+                wait = min(
+                    self.last_notify + NOTIFY_DEBOUNCE,
+                    self.first_notify + NOTIFY_MAX_DELAY
+                ) - now
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            self.notified.clear()
+            self.first_notify = self.last_notify = None
+            milestone_ids, self.pending_milestones = list(self.pending_milestones), set()
+            exception_ids, self.pending_exceptions = list(self.pending_exceptions), set()
+
+            jobs = []
+            if milestone_ids:
+                jobs.append(self.notify_milestones(milestone_ids))
+            if exception_ids:
+                jobs.append(self.notify_exceptions(exception_ids))
+            await asyncio.gather(*jobs)
+
+    async def send_milestone_notification(self, milestone):
         """Send notification for a milestone"""
         subject = f"Milestone Update: {self.format_milestone_name(milestone['milestone_name'])} - {milestone['booking_number']}"
 
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #1e3a8a; color: white; padding: 20px; text-align: center; }}
-                .content {{ background-color: #f9fafb; padding: 20px; margin-top: 20px; border-radius: 8px; }}
-                .info-row {{ margin: 10px 0; padding: 10px; background-color: white; border-left: 4px solid #1e3a8a; }}
-                .label {{ font-weight: bold; color: #1e3a8a; }}
-                .footer {{ margin-top: 20px; padding: 20px; text-align: center; color: #6b7280; font-size: 12px; }}
-                .milestone {{ background-color: #10b981; color: white; padding: 10px 20px; border-radius: 5px; display: inline-block; margin: 10px 0; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Shipment Milestone Update</h1>
-                </div>
-                <div class="content">
-                    <div class="milestone">
-                        <strong>{self.format_milestone_name(milestone['milestone_name'])}</strong>
-                    </div>
-
-                    <div class="info-row">
-                        <span class="label">Booking Number:</span> {milestone['booking_number']}
-                    </div>
-                    <div class="info-row">
-                        <span class="label">Container Number:</span> {milestone['container_number'] or 'Pending'}
-                    </div>
-                    <div class="info-row">
-                        <span class="label">Vessel:</span> {milestone['vessel_name'] or 'N/A'}
-                    </div>
-                    <div class="info-row">
-                        <span class="label">Date/Time:</span> {milestone['actual_date'].strftime('%Y-%m-%d %H:%M UTC')}
-                    </div>
-                    {f'<div class="info-row"><span class="label">Location:</span> {milestone["location"]}</div>' if milestone['location'] else ''}
-                    {f'<div class="info-row"><span class="label">Notes:</span> {milestone["notes"]}</div>' if milestone['notes'] else ''}
-
-                    <p style="margin-top: 20px;">
-                        Log in to the <a href="https://portal.seaironline.com">VHC Shipment Portal</a> to view full details and download documents.
-                    </p>
-                </div>
-                <div class="footer">
-                    <p>This is an automated notification from Seair Online Shipment Management System</p>
-                    <p>© {datetime.now().year} Seair Online. All rights reserved.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        self.send_email(self.vhc_recipients, subject, html)
-
-    def check_exceptions(self):
-        """Check for new exceptions and send alerts"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
+        html = self.tmpl_milestone.render(
+            milestone=milestone,
+            fmt=self.format_milestone_name,
+            year=datetime.now().year
+        )
+
+        return await self.send_email(self.vhc_recipients, subject, html)
+
+    async def send_milestone_digest(self, milestones):
+        """Send one notification covering a batch of milestones"""
+        subject = f"Milestone Updates: {len(milestones)} milestones - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
 
+        html = self.tmpl_milestone_digest.render(
+            milestones=milestones,
+            fmt=self.format_milestone_name,
+            year=datetime.now().year
+        )
+
+        return await self.send_email(self.vhc_recipients, subject, html)
+
+    async def check_exceptions(self):
+        """Check for new exceptions and send alerts"""
         try:
             # Get exceptions from last 15 minutes
-            query = """
-                SELECT
-                    e.exception_id, e.exception_type, e.severity, e.title, e.description,
-                    e.status, e.created_at,
-                    s.booking_number, s.container_number, s.vessel_name
-                FROM exceptions e
-                JOIN shipments s ON e.shipment_id = s.shipment_id
-                WHERE e.created_at > NOW() - INTERVAL '15 minutes'
-                  AND e.status = 'OPEN'
-            """
-
-            cursor.execute(query)
-            exceptions = cursor.fetchall()
-
-            for exception in exceptions:
-                self.send_exception_alert(exception)
-
-            print(f"Processed {len(exceptions)} exceptions")
-
-        except Exception as e:
-            print(f"Error checking exceptions: {str(e)}")
-        finally:
-            cursor.close()
-            conn.close()
+            exceptions = await self.fetch(RECENT_EXCEPTIONS_QUERY)
+
+            await asyncio.gather(
+                *(self.alert_exception_once(exception) for exception in exceptions),
+                return_exceptions=True
+            )
+
+            logger.info("Processed %d exceptions", len(exceptions))
+
+        except Exception:
+            logger.exception("Error checking exceptions")
 
-    def send_exception_alert(self, exception):
+    async def send_exception_alert(self, exception):
         """Send alert for an exception"""
         severity_colors = {
             'LOW': '#3b82f6',
@@ -202,230 +554,96 @@ class NotificationService:
 
         subject = f"🚨 Exception Alert [{exception['severity']}]: {exception['title']} - {exception['booking_number']}"
 
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: {severity_colors.get(exception['severity'], '#ef4444')}; color: white; padding: 20px; text-align: center; }}
-                .content {{ background-color: #f9fafb; padding: 20px; margin-top: 20px; border-radius: 8px; }}
-                .alert {{ background-color: #fee2e2; border-left: 4px solid #dc2626; padding: 15px; margin: 15px 0; }}
-                .info-row {{ margin: 10px 0; padding: 10px; background-color: white; }}
-                .label {{ font-weight: bold; }}
-                .footer {{ margin-top: 20px; padding: 20px; text-align: center; color: #6b7280; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>⚠️ Exception Alert</h1>
-                    <h2>{exception['severity']} Severity</h2>
-                </div>
-                <div class="content">
-                    <div class="alert">
-                        <h3>{exception['title']}</h3>
-                        <p>{exception['description'] or 'No additional details provided'}</p>
-                    </div>
-
-                    <div class="info-row">
-                        <span class="label">Exception Type:</span> {exception['exception_type']}
-                    </div>
-                    <div class="info-row">
-                        <span class="label">Booking Number:</span> {exception['booking_number']}
-                    </div>
-                    <div class="info-row">
-                        <span class="label">Container:</span> {exception['container_number'] or 'Pending'}
-                    </div>
-                    <div class="info-row">
-                        <span class="label">Vessel:</span> {exception['vessel_name'] or 'N/A'}
-                    </div>
-                    <div class="info-row">
-                        <span class="label">Reported:</span> {exception['created_at'].strftime('%Y-%m-%d %H:%M UTC')}
-                    </div>
-
-                    <p style="margin-top: 20px; font-weight: bold;">
-                        Immediate attention may be required. Please contact Seair operations team for updates.
-                    </p>
-                </div>
-                <div class="footer">
-                    <p>This is an automated alert from Seair Online Shipment Management System</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        html = self.tmpl_exception.render(
+            exception=exception,
+            header_color=severity_colors.get(exception['severity'], '#ef4444')
+        )
 
         # For critical exceptions, add escalation contacts
-        recipients = self.vhc_recipients.copy()
-        if exception['severity'] in ['HIGH', 'CRITICAL']:
-            escalation = os.getenv('ESCALATION_EMAILS', '').split(',')
-            recipients.extend([e for e in escalation if e])
+        if exception['severity'] in ('HIGH', 'CRITICAL'):
+            recipients = self.vhc_recipients + self.escalation_recipients
+        else:
+            recipients = self.vhc_recipients
 
-        self.send_email(recipients, subject, html)
+        return await self.send_email(recipients, subject, html)
 
-    def send_daily_summary(self):
+    async def send_daily_summary(self):
         """Send daily summary report"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-
         try:
-            # Get stats for last 24 hours
-            stats = {}
-
-            # Active shipments
-            cursor.execute("SELECT COUNT(*) as count FROM shipments WHERE current_status != 'COMPLETED'")
-            stats['active'] = cursor.fetchone()['count']
-
-            # Milestones achieved today
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM milestones
-                WHERE DATE(actual_date) = CURRENT_DATE
-            """)
-            stats['milestones_today'] = cursor.fetchone()['count']
-
-            # Open exceptions
-            cursor.execute("SELECT COUNT(*) as count FROM exceptions WHERE status != 'RESOLVED'")
-            stats['open_exceptions'] = cursor.fetchone()['count']
-
-            # Documents uploaded today
-            cursor.execute("""
-                SELECT COUNT(*) as count FROM documents
-                WHERE DATE(created_at) = CURRENT_DATE
-            """)
-            stats['docs_today'] = cursor.fetchone()['count']
-
-            # Recent shipments
-            cursor.execute("""
-                SELECT booking_number, container_number, current_milestone, current_status
-                FROM shipments
-                WHERE current_status != 'COMPLETED'
-                ORDER BY updated_at DESC
-                LIMIT 10
-            """)
-            recent_shipments = cursor.fetchall()
-
-            self.send_daily_summary_email(stats, recent_shipments)
-
-        except Exception as e:
-            print(f"Error generating daily summary: {str(e)}")
-        finally:
-            cursor.close()
-            conn.close()
+            async with self.smtp_pool.session() as server:
+                # Both queries and the SMTP login run concurrently
+                stats, recent_shipments, _ = await asyncio.gather(
+                    self.fetchone(DAILY_STATS_QUERY),
+                    self.fetch(RECENT_SHIPMENTS_QUERY),
+                    server.warm_up()
+                )
 
-    def send_daily_summary_email(self, stats, shipments):
+                await self.send_daily_summary_email(stats, recent_shipments, server)
+
+        except Exception:
+            logger.exception("Error generating daily summary")
+
+    async def send_daily_summary_email(self, stats, shipments, server):
         """Send the daily summary email"""
         subject = f"Daily Shipment Summary - {datetime.now().strftime('%Y-%m-%d')}"
 
-        shipments_html = ''.join([
-            f"""
-            <tr>
-                <td style="padding: 8px; border-bottom: 1px solid #e5e7eb;">{s['booking_number']}</td>
-                <td style="padding: 8px; border-bottom: 1px solid #e5e7eb;">{s['container_number'] or 'Pending'}</td>
-                <td style="padding: 8px; border-bottom: 1px solid #e5e7eb;">{self.format_milestone_name(s['current_milestone'])}</td>
-            </tr>
-            """ for s in shipments
-        ])
-
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 700px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #1e3a8a; color: white; padding: 20px; text-align: center; }}
-                .stats {{ display: flex; justify-content: space-around; margin: 20px 0; }}
-                .stat-box {{ background-color: #f3f4f6; padding: 20px; border-radius: 8px; text-align: center; flex: 1; margin: 0 10px; }}
-                .stat-number {{ font-size: 36px; font-weight: bold; color: #1e3a8a; }}
-                .stat-label {{ color: #6b7280; margin-top: 5px; }}
-                table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                th {{ background-color: #1e3a8a; color: white; padding: 12px; text-align: left; }}
-                .footer {{ margin-top: 20px; padding: 20px; text-align: center; color: #6b7280; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Daily Shipment Summary</h1>
-                    <p>{datetime.now().strftime('%B %d, %Y')}</p>
-                </div>
-
-                <div class="stats">
-                    <div class="stat-box">
-                        <div class="stat-number">{stats['active']}</div>
-                        <div class="stat-label">Active Shipments</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">{stats['milestones_today']}</div>
-                        <div class="stat-label">Milestones Today</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">{stats['docs_today']}</div>
-                        <div class="stat-label">Docs Uploaded</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">{stats['open_exceptions']}</div>
-                        <div class="stat-label">Open Exceptions</div>
-                    </div>
-                </div>
-
-                <h2 style="color: #1e3a8a; margin-top: 30px;">Recent Active Shipments</h2>
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Booking Number</th>
-                            <th>Container</th>
-                            <th>Current Milestone</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {shipments_html}
-                    </tbody>
-                </table>
-
-                <p style="margin-top: 30px;">
-                    <a href="https://portal.seaironline.com" style="background-color: #1e3a8a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        View Full Portal
-                    </a>
-                </p>
-
-                <div class="footer">
-                    <p>This is an automated daily summary from Seair Online</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        self.send_email(self.vhc_recipients, subject, html)
-
-    def format_milestone_name(self, name):
+        html = self.tmpl_daily_summary.render(
+            stats=stats,
+            shipments=shipments,
+            fmt=self.format_milestone_name,
+            today=datetime.now()
+        )
+
+        return await self.send_email(self.vhc_recipients, subject, html, server)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def format_milestone_name(name):
         """Format milestone name for display"""
         if not name:
             return 'N/A'
         return name.replace('_', ' ').title()
 
-    def run(self):
+    async def listen(self):
+        """Hold a dedicated LISTEN connection, reconnecting whenever it drops"""
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True)
+                async with conn:
+                    await conn.execute("LISTEN milestone_completed")
+                    await conn.execute("LISTEN exception_open")
+                    async for notify in conn.notifies():
+                        self.queue_notification(notify.channel, notify.payload)
+            except (OSError, psycopg.Error) as e:
+                logger.warning("Listen connection error: %s", e)
+
+            # The fallback poll covers whatever was missed in the gap
+            logger.warning("Listen connection lost, reconnecting")
+            await asyncio.sleep(5)
+
+    async def run(self):
         """Run the notification service"""
-        print("Starting Notification Service...")
-        print(f"Monitoring milestones and exceptions every 5 minutes")
-        print(f"Daily summary at 08:00 UTC")
-
-        # Schedule tasks
-        schedule.every(5).minutes.do(self.check_new_milestones)
-        schedule.every(5).minutes.do(self.check_exceptions)
-        schedule.every().day.at("08:00").do(self.send_daily_summary)
+        logger.info("Starting Notification Service...")
+        logger.info("Listening for milestone and exception events")
+        logger.info("Fallback poll every 5 minutes")
+        logger.info("Daily summary at 08:00 UTC")
 
-        # Run immediately on start
-        self.check_new_milestones()
-        self.check_exceptions()
+        await self.start()
 
-        # Keep running
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        # The polls also run immediately on start
+        await asyncio.gather(
+            every(5 * 60, self.check_new_milestones),
+            every(5 * 60, self.check_exceptions),
+            self.drain_notifications(),
+            daily_at('08:00', self.send_daily_summary),
+            self.listen()
+        )
 
 
 if __name__ == '__main__':
+    configure_logging()
     service = NotificationService()
-    service.run()
+    if uvloop is not None:
+        uvloop.run(service.run())
+    else:
+        asyncio.run(service.run())
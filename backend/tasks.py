@@ -0,0 +1,142 @@
+"""
+VHC Shipment Management System - Background Tasks
+Celery tasks for work that should not block API requests
+
+Run a worker dedicated to outbound email with:
+    celery -A tasks worker -Q email_queue --concurrency=2
+
+and one for database bookkeeping with:
+    celery -A tasks worker -Q db_queue
+"""
+
+import os
+import logging
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from celery import Celery
+from sqlalchemy import create_engine, text
+
+logger = logging.getLogger(__name__)
+
+celery = Celery('vhc', broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+celery.conf.update(
+    task_ignore_result=True,
+    task_serializer='msgpack',
+    accept_content=['msgpack']
+)
+
+
+_engine = None
+
+
+def get_engine():
+    """Database engine for tasks, created on first use in each worker"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            os.getenv('DATABASE_URL', 'postgresql://localhost/vhc_shipments'),
+            pool_pre_ping=True
+        )
+    return _engine
+
+
+class SmtpPool:
+    """Keeps one authenticated SMTP session per worker thread"""
+
+    def __init__(self, server, port, user, password):
+        self.server = server
+        self.port = port
+        self.user = user
+        self.password = password
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.server, self.port)
+        conn.starttls()
+        conn.login(self.user, self.password)
+        self._local.conn = conn
+        return conn
+
+    def get(self):
+        """Return a live connection, reconnecting if the session has gone stale"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return self._connect()
+        try:
+            if conn.noop()[0] == 250:
+                return conn
+        except smtplib.SMTPServerDisconnected:
+            pass
+        self.discard()
+        return self._connect()
+
+    def discard(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.quit()
+            except smtplib.SMTPException:
+                pass
+
+    def send_message(self, msg):
+        try:
+            self.get().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.discard()
+            self.get().send_message(msg)
+
+
+_smtp_pool = None
+
+
+def get_smtp_pool():
+    """Build the SMTP pool on first use, or None if credentials are missing"""
+    global _smtp_pool
+    if _smtp_pool is None:
+        smtp_user = os.getenv('SMTP_USER')
+        smtp_password = os.getenv('SMTP_PASSWORD')
+        if not smtp_user or not smtp_password:
+            return None
+        _smtp_pool = SmtpPool(
+            os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+            int(os.getenv('SMTP_PORT', '587')),
+            smtp_user,
+            smtp_password
+        )
+    return _smtp_pool
+
+
+@celery.task(queue='email_queue')
+def send_notification_email_task(recipients, subject, message):
+    """Send email notifications"""
+    try:
+        pool = get_smtp_pool()
+        if pool is None:
+            logger.warning("Email credentials not configured")
+            return False
+
+        msg = MIMEMultipart()
+        msg['From'] = pool.user
+        msg['To'] = ', '.join(recipients) if isinstance(recipients, list) else recipients
+        msg['Subject'] = subject
+        msg.attach(MIMEText(message, 'html'))
+
+        pool.send_message(msg)
+
+        return True
+    except Exception:
+        logger.exception("Error sending email %r", subject)
+        return False
+
+
+@celery.task(queue='db_queue')
+def update_last_login_task(user_id, last_login):
+    """Record a user's last login outside the login request"""
+    with get_engine().begin() as conn:
+        conn.execute(
+            text("UPDATE users SET last_login = :last_login WHERE user_id = :user_id"),
+            {'last_login': last_login, 'user_id': user_id}
+        )
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from flask_jwt_extended import create_access_token
+
+import app as app_module
+
+PART_SIZE = 8
+USER = {'user_id': 1, 'email': 'ops@example.com', 'team': 'VHC', 'role': 'admin', 'is_active': True}
+
+
+class MultipartUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        for name, value in (
+            ('MULTIPART_FOLDER', self.folder),
+            ('MULTIPART_PART_SIZE', PART_SIZE),
+        ):
+            patcher = mock.patch.object(app_module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        lookup = mock.patch.object(app_module.jwt, '_user_lookup_callback', lambda header, data: USER)
+        lookup.start()
+        self.addCleanup(lookup.stop)
+
+        self.client = app_module.app.test_client()
+        with app_module.app.app_context():
+            token = create_access_token(identity=str(USER['user_id']))
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def init_upload(self, total_size):
+        response = self.client.post(
+            '/api/shipments/1/documents/multipart/init',
+            json={'filename': 'bl.pdf', 'document_type': 'BL', 'total_size': total_size},
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['upload_id']
+
+    def put_part(self, upload_id, part_no, body):
+        return self.client.put(f'/api/documents/multipart/{upload_id}/{part_no}', data=body, headers=self.headers)
+
+    def test_failed_part_retry_is_reported_missing(self):
+        upload_id = self.init_upload(PART_SIZE + 4)
+        self.assertEqual(self.put_part(upload_id, 1, b'a' * PART_SIZE).status_code, 200)
+        self.assertEqual(self.put_part(upload_id, 2, b'b' * 4).status_code, 200)
+
+        self.assertEqual(self.put_part(upload_id, 1, b'c' * 3).status_code, 400)
+
+        response = self.client.post(f'/api/documents/multipart/{upload_id}/complete', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['missing_parts'], [1])
+        self.assertFalse(os.path.exists(os.path.join(self.folder, upload_id, 'completing')))
+
+    def test_part_rejected_while_completing(self):
+        upload_id = self.init_upload(PART_SIZE)
+        os.mkdir(os.path.join(self.folder, upload_id, 'completing'))
+
+        self.assertEqual(self.put_part(upload_id, 1, b'a' * PART_SIZE).status_code, 409)
+
+        os.rename(os.path.join(self.folder, upload_id, 'data'), os.path.join(self.folder, 'moved'))
+        self.assertEqual(self.put_part(upload_id, 1, b'a' * PART_SIZE).status_code, 409)
+
+    def test_staged_uploads_capped_per_user(self):
+        with mock.patch.object(app_module, 'MULTIPART_MAX_PER_USER', 2):
+            self.init_upload(PART_SIZE)
+            self.init_upload(PART_SIZE)
+            response = self.client.post(
+                '/api/shipments/1/documents/multipart/init',
+                json={'filename': 'bl.pdf', 'document_type': 'BL', 'total_size': PART_SIZE},
+                headers=self.headers,
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(os.listdir(self.folder)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,16 @@
+"""
+VHC Shipment Management System - WSGI entrypoint
+Production entrypoint for gunicorn with gevent workers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+# Patch blocking stdlib I/O before anything imports sockets, then make
+# psycopg2 yield to other greenlets while it waits on Postgres
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg  # noqa: E402
+patch_psycopg()
+
+from app import app  # noqa: E402,F401